@@ -19,29 +19,42 @@
 from argparse import ArgumentParser
 from traceback import print_exc
 from sys import stdout, stderr
+from codecs import escape_decode
 import textwrap
 import re
 
-def color_maybe(color_attr, text):
-    if stdout.isatty():
-        return '\033[0;' + str(color_attr) + 'm' + text + '\033[0m'
+# output doesn't change to/from a terminal while running, check only once
+_use_color = stdout.isatty()
+
+def color_maybe(color_attr):
+    if _use_color:
+        prefix = '\033[0;' + str(color_attr) + 'm'
+        return lambda text: prefix + text + '\033[0m'
     else:
-        return text
+        return lambda text: text
+
+red = color_maybe(31)
+green = color_maybe(32)
+yellow = color_maybe(33)
+cyan = color_maybe(36)
 
-red = lambda text: color_maybe(31, text)
-green = lambda text: color_maybe(32, text)
-yellow = lambda text: color_maybe(33, text)
-cyan = lambda text: color_maybe(36, text)
+# diagnostics are collected and written out in one go
+_output = []
+
+def output(text=''):
+    _output.append(text + '\n')
+
+def flush_output():
+    stdout.write(''.join(_output))
+    _output.clear()
 
 
 def print_wrapped(wrapped_text, rows, cols):
-    if type(wrapped_text) == str:
-        wrapped_text = [wrapped_text]
     for r, line in enumerate(wrapped_text):
         r_ = str(r + 1).rjust(3)
         if r >= rows:
             r_ = red(r_)
-        print((' {} |{:' + str(cols) + 's}|').format(r_, line))
+        output(' ' + r_ + ' |' + line.ljust(cols) + '|')
 
 def print_truncated(text, cols):
     if len(text) <= cols:
@@ -50,39 +63,44 @@ def print_truncated(text, cols):
     else:
         prefix = text[0:cols]
         suffix = red(text[cols:])
-    print('   |' + prefix + '|' + suffix)
+    output('   |' + prefix + '|' + suffix)
 
 def print_ruler(spc, cols):
-    print(' ' * spc + cyan(('₀₁₂₃₄₅₆₇₈₉'*4)[:cols]))
+    output(' ' * spc + cyan(('₀₁₂₃₄₅₆₇₈₉'*4)[:cols]))
 
 def print_source_translation(source, translation, wrapped_source, wrapped_translation, rows, cols):
     if rows == 1:
-        print(' source text:')
+        output(' source text:')
         print_ruler(4, cols);
         print_truncated(source, cols)
-        print(' translated text:')
+        output(' translated text:')
         print_ruler(4, cols);
         print_truncated(translation, cols)
     else:
-        print(' source text:')
+        output(' source text:')
         print_ruler(6, cols);
         print_wrapped(wrapped_source, rows, cols)
-        print(' translated text:')
+        output(' translated text:')
         print_ruler(6, cols);
         print_wrapped(wrapped_translation, rows, cols)
-    print()
+    output()
 
 def highlight_trailing_white(text):
-    if type(text) == str:
+    if isinstance(text, str):
         return re.sub(r' $', '·', text)
     else:
         ret = text[:]
         ret[-1] = highlight_trailing_white(ret[-1])
         return ret
 
+_wrappers = {}
+
 def wrap_text(text, cols):
-    # wrap text
-    ret = list(textwrap.TextWrapper(width=cols).wrap(text))
+    # wrap text, reusing one TextWrapper per width
+    wrapper = _wrappers.get(cols)
+    if wrapper is None:
+        wrapper = _wrappers[cols] = textwrap.TextWrapper(width=cols)
+    ret = wrapper.wrap(text)
     if len(ret):
         # add back trailing whitespace
         ret[-1] += ' ' * (len(text) - len(text.rstrip()))
@@ -91,14 +109,24 @@ def wrap_text(text, cols):
 def unescape(text):
     if '\\' not in text:
         return text
-    return text.encode('ascii').decode('unicode_escape')
+    return escape_decode(text.encode('ascii'))[0].decode('latin-1')
+
+_IGN_FIRST = frozenset({'%', '?'})
+_IGN_LAST = frozenset({'.', "'"})
 
 def ign_char_first(c):
-    return c.isalnum() or c in {'%', '?'}
+    return c.isalnum() or c in _IGN_FIRST
 
 def ign_char_last(c):
-    return c.isalnum() or c in {'.', "'"}
+    return c.isalnum() or c in _IGN_LAST
+
+
+# one " c=N" or " r=N" item following the message id in a comment line
+_DISPLAY_DEF_RE = re.compile(r' ([cr])=(\d+)(?!\S)')
 
+def unknown_display_def(comment, lines):
+    raise RuntimeError(
+        "Unknown display definition %s on line %d" % (comment, lines))
 
 def parse_txt(lang, no_warning, warn_empty):
     """Parse txt file and check strings to display definition."""
@@ -107,125 +135,147 @@ def parse_txt(lang, no_warning, warn_empty):
     else:
         file_path = "lang_en_%s.txt" % lang
 
-    print(green("Start %s lang-check" % lang))
-
-    lines = 1
-    with open(file_path) as src:
-        while True:
-            comment = src.readline().split(' ')
-            #print (comment) #Debug
-
-            #Check if columns and rows are defined
-            cols = None
-            rows = None
-            for item in comment[1:]:
-                key, val = item.split('=')
-                if key == 'c':
-                    cols = int(val)
-                    #print ("c=",cols) #Debug
-                elif key == 'r':
-                    rows = int(val)
-                    #print ("r=",rows) #Debug
-                else:
-                    raise RuntimeError(
-                        "Unknown display definition %s on line %d" %
-                        (' '.join(comment), lines))
-            if cols is None and rows is None:
-                if not no_warning:
-                    print(yellow("[W]: No display definition on line %d" % lines))
-                cols = len(translation)     # propably fullscreen
-            if rows is None:
-                rows = 1
-            elif rows > 1 and cols != 20:
-                print(yellow("[W]: Multiple rows with odd number of columns on line %d" % lines))
-
-            #Wrap text to 20 chars and rows
-            source = src.readline()[:-1].strip('"')
-            #print (source) #Debug
-            translation = src.readline()[:-1].strip('"')
-            if translation == '\\x00':
-                # crude hack to handle intentionally-empty translations
-                translation = ''
-
-            # handle backslash sequences
-            source = unescape(source)
-            translation = unescape(translation)
-
-            #print (translation) #Debug
+    output(green("Start %s lang-check" % lang))
+
+    with open(file_path, 'rb') as src:
+        data = src.read().decode('utf-8')
+    if '\r' in data:
+        # keep accepting CRLF files as text mode did
+        data = data.replace('\r\n', '\n')
+    src_lines = data.split('\n')
+
+    for i in range(0, len(src_lines), 4):
+        lines = i + 1
+        comment, source_line, translation_line = (src_lines[i:i + 3] + ['', ''])[:3]
+        #print (comment) #Debug
+
+        #Check if columns and rows are defined
+        cols = None
+        rows = None
+        defs = _DISPLAY_DEF_RE.findall(comment)
+        if len(defs) != comment.count(' '):
+            unknown_display_def(comment, lines)
+        for key, val in defs:
+            if key == 'c':
+                cols = int(val)
+                #print ("c=",cols) #Debug
+            else:
+                rows = int(val)
+                #print ("r=",rows) #Debug
+        if cols is None and rows is None:
+            if not no_warning:
+                output(yellow("[W]: No display definition on line %d" % lines))
+            cols = len(translation)     # propably fullscreen
+        if rows is None:
+            rows = 1
+        elif rows > 1 and cols != 20:
+            output(yellow("[W]: Multiple rows with odd number of columns on line %d" % lines))
+
+        #Wrap text to 20 chars and rows
+        source = source_line.strip('"')
+        #print (source) #Debug
+        translation = translation_line.strip('"')
+        if translation == '\\x00':
+            # crude hack to handle intentionally-empty translations
+            translation = ''
+
+        # handle backslash sequences
+        source = unescape(source)
+        translation = unescape(translation)
+
+        #print (translation) #Debug
+        # single-row text which fits doesn't need to be wrapped, unless it
+        # contains tabs: these are expanded by textwrap and can add rows
+        if rows == 1 and len(source) <= cols and '\t' not in source:
+            wrapped_source = [source]
+        else:
             wrapped_source = wrap_text(source, cols)
-            rows_count_source = len(wrapped_source)
+        rows_count_source = len(wrapped_source)
+        if rows == 1:
+            # single-row translation is printed truncated, it's only wrapped
+            # to get the row count when too long or when it contains tabs
+            # (expanded by textwrap, these can add rows)
+            wrapped_translation = [translation]
+            if len(translation) > cols or '\t' in translation:
+                rows_count_translation = len(wrap_text(translation, cols))
+            else:
+                rows_count_translation = 1
+        else:
             wrapped_translation = wrap_text(translation, cols)
             rows_count_translation = len(wrapped_translation)
 
-            # Check for potential errors in the definition
-            if not no_warning:
-                # Incorrect number of rows/cols on the definition
-                if rows == 1 and (len(source) > cols or rows_count_source > rows):
-                    print(yellow('[W]: Source text longer than %d cols as defined on line %d:' % (cols, lines)))
-                    print_ruler(4, cols);
-                    print_truncated(source, cols)
-                    print()
-                elif rows_count_source > rows:
-                    print(yellow('[W]: Wrapped source text longer than %d rows as defined on line %d:' % (rows, lines)))
+        # text without trailing whitespace is needed by several checks
+        source_rstrip = source.rstrip()
+        translation_rstrip = translation.rstrip()
+
+        # Check for potential errors in the definition
+        if not no_warning:
+            # Incorrect number of rows/cols on the definition
+            if rows == 1 and (len(source) > cols or rows_count_source > rows):
+                output(yellow('[W]: Source text longer than %d cols as defined on line %d:' % (cols, lines)))
+                print_ruler(4, cols);
+                print_truncated(source, cols)
+                output()
+            elif rows_count_source > rows:
+                output(yellow('[W]: Wrapped source text longer than %d rows as defined on line %d:' % (rows, lines)))
+                print_ruler(6, cols);
+                print_wrapped(wrapped_source, rows, cols)
+                output()
+
+            # Missing translation
+            if len(translation) == 0 and (warn_empty or rows > 1):
+                if rows == 1:
+                    output(yellow("[W]: Empty translation for \"%s\" on line %d" % (source, lines)))
+                else:
+                    output(yellow("[W]: Empty translation on line %d" % lines))
                     print_ruler(6, cols);
                     print_wrapped(wrapped_source, rows, cols)
-                    print()
-
-                # Missing translation
-                if len(translation) == 0 and (warn_empty or rows > 1):
-                    if rows == 1:
-                        print(yellow("[W]: Empty translation for \"%s\" on line %d" % (source, lines)))
-                    else:
-                        print(yellow("[W]: Empty translation on line %d" % lines))
-                        print_ruler(6, cols);
-                        print_wrapped(wrapped_source, rows, cols)
-                        print()
-
-
-            # Check for translation lenght
-            if (rows_count_translation > rows) or (rows == 1 and len(translation) > cols):
-                print(red('[E]: Text is longer than definition on line %d: cols=%d rows=%d (rows diff=%d)'
-                          % (lines, cols, rows, rows_count_translation-rows)))
-                print_source_translation(source, translation,
-                                         wrapped_source, wrapped_translation,
-                                         rows, cols)
-
-            # Different count of % sequences
-            if source.count('%') != translation.count('%') and len(translation) > 0:
-                print(red('[E]: Unequal count of %% escapes on line %d:' % (lines)))
-                print_source_translation(source, translation,
-                                         wrapped_source, wrapped_translation,
-                                         rows, cols)
-
-            # Different first/last character
-            if not no_warning and len(source) > 0 and len(translation) > 0:
-                source_end = source.rstrip()[-1]
-                translation_end = translation.rstrip()[-1]
+                    output()
+
+
+        # Check for translation lenght
+        if (rows_count_translation > rows) or (rows == 1 and len(translation) > cols):
+            output(red('[E]: Text is longer than definition on line %d: cols=%d rows=%d (rows diff=%d)'
+                      % (lines, cols, rows, rows_count_translation-rows)))
+            print_source_translation(source, translation,
+                                     wrapped_source, wrapped_translation,
+                                     rows, cols)
+
+        # Different count of % sequences
+        if source.count('%') != translation.count('%') and len(translation) > 0:
+            output(red('[E]: Unequal count of %% escapes on line %d:' % (lines)))
+            print_source_translation(source, translation,
+                                     wrapped_source, wrapped_translation,
+                                     rows, cols)
+
+        if not no_warning and len(translation) > 0:
+            if len(source) > 0:
+                # Different first/last character
+                source_end = source_rstrip[-1]
+                translation_end = translation_rstrip[-1]
                 start_diff = not (ign_char_first(source[0]) and ign_char_first(translation[0])) and source[0] != translation[0]
                 end_diff = not (ign_char_last(source_end) and ign_char_last(translation_end)) and source_end != translation_end
                 if start_diff or end_diff:
                     if start_diff:
-                        print(yellow('[W]: Differing first punctuation character (%s => %s) on line %d:' % (source[0], translation[0], lines)))
+                        output(yellow('[W]: Differing first punctuation character (%s => %s) on line %d:' % (source[0], translation[0], lines)))
                     if end_diff:
-                        print(yellow('[W]: Differing last punctuation character (%s => %s) on line %d:' % (source[-1], translation[-1], lines)))
+                        output(yellow('[W]: Differing last punctuation character (%s => %s) on line %d:' % (source[-1], translation[-1], lines)))
                     print_source_translation(source, translation,
                                              wrapped_source, wrapped_translation,
                                              rows, cols)
 
-            # Short translation
-            if not no_warning and len(source) > 0 and len(translation) > 0:
-                if len(translation.rstrip()) < len(source.rstrip()) / 2:
-                    print(yellow('[W]: Short translation on line %d:' % (lines)))
+                # Short translation
+                if len(translation_rstrip) < len(source_rstrip) / 2:
+                    output(yellow('[W]: Short translation on line %d:' % (lines)))
                     print_source_translation(source, translation,
                                              wrapped_source, wrapped_translation,
                                              rows, cols)
 
             # Incorrect trailing whitespace in translation
-            if not no_warning and len(translation) > 0 and \
-               (source.rstrip() == source or (rows == 1 and len(source) == cols)) and \
-               translation.rstrip() != translation and \
-               (rows > 1 or len(translation) != len(source)):
-                print(yellow('[W]: Incorrect trailing whitespace for translation on line %d:' % (lines)))
+            if (source_rstrip == source or (rows == 1 and len(source) == cols)) and \
+                translation_rstrip != translation and \
+                (rows > 1 or len(translation) != len(source)):
+                output(yellow('[W]: Incorrect trailing whitespace for translation on line %d:' % (lines)))
                 source = highlight_trailing_white(source)
                 translation = highlight_trailing_white(translation)
                 wrapped_translation = highlight_trailing_white(wrapped_translation)
@@ -233,20 +283,19 @@ def parse_txt(lang, no_warning, warn_empty):
                                          wrapped_source, wrapped_translation,
                                          rows, cols)
 
-            if len(src.readline()) != 1:  # empty line
-                break
-            lines += 4
-    print(green("End %s lang-check" % lang))
+        if src_lines[i + 3:i + 4] != ['']:  # empty line
+            break
+    output(green("End %s lang-check" % lang))
 
 
 def main():
     """Main function."""
     parser = ArgumentParser(
         description=__doc__,
-        usage="%(prog)s lang")
+        usage="%(prog)s [lang ...]")
     parser.add_argument(
-        "lang", nargs='?', default="en", type=str,
-        help="Check lang file (en|cs|de|es|fr|nl|it|pl)")
+        "lang", nargs='*', default=["en"], type=str,
+        help="Check lang files (en|cs|de|es|fr|nl|it|pl)")
     parser.add_argument(
         "--no-warning", action="store_true",
         help="Disable warnings")
@@ -256,7 +305,11 @@ def main():
 
     args = parser.parse_args()
     try:
-        parse_txt(args.lang, args.no_warning, args.warn_empty)
+        for lang in args.lang:
+            try:
+                parse_txt(lang, args.no_warning, args.warn_empty)
+            finally:
+                flush_output()
         return 0
     except Exception as exc:
         print_exc()